@@ -5,26 +5,42 @@
 #
 # LICENSE: see bottom of file
 
+import os
 import sys
+import asyncio
 import zmq
-import json
+import zmq.asyncio
 from pprint import pprint
 
-context = zmq.Context()
-sock = context.socket(zmq.SUB)
+try:
+    # orjson parses the bytes directly and is much faster
+    from orjson import loads
+except ImportError:
+    from json import loads
 
-ep = "tcp://127.0.0.1:5556"
-print(f"Receive from {ep}")
-sock.connect(ep)
+try:
+    # uvloop is optional, but gives a faster event loop
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
 
-# subscribe to all events
-sock.setsockopt(zmq.SUBSCRIBE, bytes([]))
+# Set DEBUG in the environment to pretty-print the event contents
+debug = bool(os.environ.get("DEBUG"))
 
-while True:
-    parts = sock.recv_multipart()
+# Event names repeat, decode each of them only once
+topics = {}
+
+def handle(parts, loads=loads):
     if len(parts) == 2:
-        print("Received event '{}'".format(parts[0].decode()))
-        pprint(json.loads(parts[1].decode()))
+        topic = topics.get(parts[0])
+        if topic is None:
+            topic = topics[parts[0]] = sys.intern(parts[0].decode())
+        print("Received event '{}'".format(topic))
+        if debug:
+            pprint(loads(parts[1]))
+        else:
+            print(loads(parts[1]))
 
     else:
         print("Received strange event:")
@@ -32,6 +48,22 @@ while True:
 
     print()
 
+async def main():
+    context = zmq.asyncio.Context()
+    sock = context.socket(zmq.SUB)
+
+    ep = "tcp://127.0.0.1:5556"
+    print(f"Receive from {ep}")
+    sock.connect(ep)
+
+    # subscribe to all events
+    sock.setsockopt(zmq.SUBSCRIBE, bytes([]))
+
+    while True:
+        handle(await sock.recv_multipart())
+
+asyncio.run(main())
+
 
 # This is free and unencumbered software released into the public domain.
 #
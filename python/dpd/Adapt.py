@@ -154,8 +154,8 @@ class Adapt:
             raise ValueError("Unknown predistorter '{}'".format(dpddata[0]))
         self._mod_rc.set_param_value("memlesspoly", "coeffile", self._coef_path)
 
-    def dump(self, path: str) -> None:
-        """Backup current settings to a file"""
+    def dump(self, path: str) -> dict:
+        """Backup current settings to a file, and return them"""
 
         d = {
             "txgain": self.get_txgain(),
@@ -167,6 +167,8 @@ class Adapt:
         with open(path, "wb") as f:
             pickle.dump(d, f)
 
+        return d
+
     def restore(self, path: str):
         """Restore settings from a file"""
         with open(path, "rb") as f:
@@ -11,6 +11,7 @@ import matplotlib.pyplot as plt
 import datetime
 import os
 import logging
+from dpd.kernels import abs_median
 
 
 def _check_input_extract(tx_dpd, rx_received):
@@ -20,45 +21,42 @@ def _check_input_extract(tx_dpd, rx_received):
     assert rx_received[0].dtype == np.complex64, \
         "rx_received is not complex64 but {}".format(rx_received[0].dtype)
     # Check if signals have same normalization
-    normalization_error = np.abs(np.median(np.abs(tx_dpd)) -
-                                 np.median(np.abs(rx_received))) / (
-                              np.median(np.abs(tx_dpd)) + np.median(np.abs(rx_received)))
+    tx_median = abs_median(tx_dpd)
+    rx_median = abs_median(rx_received)
+    normalization_error = np.abs(tx_median - rx_median) / (tx_median + rx_median)
     assert normalization_error < 0.01, "Non normalized signals"
 
 
-def _phase_diff_value_per_bin(phase_diffs_values_lists):
-    phase_list = []
-    for values in phase_diffs_values_lists:
-        mean = np.mean(values) if len(values) > 0 else np.nan
-        phase_list.append(mean)
-    return phase_list
-
-
 class ExtractStatistic:
     """Calculate a low variance RX value for equally spaced tx values
     of a predefined range"""
 
     def __init__(self, c, peak_amplitude):
         self.c = c
+        self.n_per_bin = c.ES_n_per_bin
+
+        # TX and RX values for each bin, of which the first
+        # n_filled[bin] entries are valid
+        self.tx_values = np.zeros((c.ES_n_bins, self.n_per_bin), dtype=np.complex64)
+        self.rx_values = np.zeros((c.ES_n_bins, self.n_per_bin), dtype=np.complex64)
+        self.n_filled = np.zeros(c.ES_n_bins, dtype=int)
 
+        self.reset(peak_amplitude)
+
+    def reset(self, peak_amplitude=None):
+        """Discard all accumulated measurements, so that the object can
+        be reused for the next run. If peak_amplitude is given, the bin
+        boundaries are recalculated, otherwise they are kept."""
         self._plot_data = None
 
         # Number of measurements used to extract the statistic
         self.n_meas = 0
 
         # Boundaries for the bins
-        self.tx_boundaries = np.linspace(0.0, peak_amplitude, c.ES_n_bins + 1)
-        self.n_per_bin = c.ES_n_per_bin
+        if peak_amplitude is not None:
+            self.tx_boundaries = np.linspace(0.0, peak_amplitude, self.c.ES_n_bins + 1)
 
-        # List of rx values for each bin
-        self.rx_values_lists = []
-        for i in range(c.ES_n_bins):
-            self.rx_values_lists.append([])
-
-        # List of tx values for each bin
-        self.tx_values_lists = []
-        for i in range(c.ES_n_bins):
-            self.tx_values_lists.append([])
+        self.n_filled[:] = 0
 
     def get_bin_info(self):
         return "Binning: {} bins used for amplitudes between {} and {}".format(
@@ -66,7 +64,7 @@ class ExtractStatistic:
 
     def plot(self, plot_path, title):
         if self._plot_data is not None:
-            tx_values, rx_values, phase_diffs_values, phase_diffs_values_lists = self._plot_data
+            tx_values, rx_values, phase_diffs_values, phase_diffs = self._plot_data
 
             sub_rows = 3
             sub_cols = 1
@@ -79,7 +77,7 @@ class ExtractStatistic:
                     label="Averaged measurements",
                     color="red")
             for i, tx_value in enumerate(tx_values):
-                rx_values_list = self.rx_values_lists[i]
+                rx_values_list = self.rx_values[i, :self.n_filled[i]]
                 ax.scatter(np.ones(len(rx_values_list)) * tx_value,
                            np.abs(rx_values_list),
                            s=0.1,
@@ -97,7 +95,7 @@ class ExtractStatistic:
                     label="Averaged measurements",
                     color="red")
             for i, tx_value in enumerate(tx_values):
-                phase_diff = phase_diffs_values_lists[i]
+                phase_diff = phase_diffs[i, :self.n_filled[i]]
                 ax.scatter(np.ones(len(phase_diff)) * tx_value,
                            np.rad2deg(phase_diff),
                            s=0.1,
@@ -108,13 +106,9 @@ class ExtractStatistic:
             ax.set_xlim(0, np.max(self.tx_boundaries))
             ax.legend(loc=4)
 
-            num = []
-            for i, tx_value in enumerate(tx_values):
-                rx_values_list = self.rx_values_lists[i]
-                num.append(len(rx_values_list))
             i_sub += 1
             ax = plt.subplot(sub_rows, sub_cols, i_sub)
-            ax.plot(num)
+            ax.plot(self.n_filled)
             ax.set_xlabel("TX Amplitude bin")
             ax.set_ylabel("Number of Samples")
             ax.set_ylim(0, self.n_per_bin * 1.2)
@@ -123,27 +117,11 @@ class ExtractStatistic:
             fig.savefig(plot_path)
             plt.close(fig)
 
-    def _rx_value_per_bin(self):
-        rx_values = []
-        for values in self.rx_values_lists:
-            mean = np.mean(np.abs(values)) if len(values) > 0 else np.nan
-            rx_values.append(mean)
-        return rx_values
-
-    def _tx_value_per_bin(self):
-        tx_values = []
-        for start, end in zip(self.tx_boundaries, self.tx_boundaries[1:]):
-            tx_values.append(np.mean((start, end)))
-        return tx_values
-
-    def _phase_diff_list_per_bin(self):
-        phase_values_lists = []
-        for tx_list, rx_list in zip(self.tx_values_lists, self.rx_values_lists):
-            phase_diffs = []
-            for tx, rx in zip(tx_list, rx_list):
-                phase_diffs.append(np.angle(rx * tx.conjugate()))
-            phase_values_lists.append(phase_diffs)
-        return phase_values_lists
+    def _mean_per_bin(self, values):
+        """Mean over the valid entries of each bin, nan for empty bins"""
+        valid = np.arange(self.n_per_bin) < self.n_filled[:, np.newaxis]
+        with np.errstate(invalid='ignore'):
+            return np.sum(values, axis=1, where=valid) / self.n_filled
 
     def extract(self, tx_dpd, rx):
         """Extract information from a new measurement and store them
@@ -151,26 +129,40 @@ class ExtractStatistic:
         _check_input_extract(tx_dpd, rx)
         self.n_meas += 1
 
+        # Bin of every sample. Samples that are outside the boundaries
+        # or exactly on one of them are not used.
         tx_abs = np.abs(tx_dpd)
-        for i, (tx_start, tx_end) in enumerate(zip(self.tx_boundaries, self.tx_boundaries[1:])):
-            mask = (tx_abs > tx_start) & (tx_abs < tx_end)
-            n_add = max(0, self.n_per_bin - len(self.rx_values_lists[i]))
-            self.rx_values_lists[i] += \
-                list(rx[mask][:n_add])
-            self.tx_values_lists[i] += \
-                list(tx_dpd[mask][:n_add])
-
-        rx_values = self._rx_value_per_bin()
-        tx_values = self._tx_value_per_bin()
-
-        n_per_bin = np.array([len(values) for values in self.rx_values_lists])
+        bins = np.searchsorted(self.tx_boundaries, tx_abs) - 1
+        idxs = np.flatnonzero((bins >= 0) & (bins < self.c.ES_n_bins))
+        bins = bins[idxs]
+        inside = tx_abs[idxs] < self.tx_boundaries[bins + 1]
+        idxs = idxs[inside]
+        bins = bins[inside]
+
+        # Group the samples by bin, keeping their order, and fill up
+        # every bin with its first samples until it has n_per_bin values
+        order = np.argsort(bins, kind='stable')
+        idxs = idxs[order]
+        bins = bins[order]
+        counts = np.bincount(bins, minlength=self.c.ES_n_bins)
+        rank = np.arange(len(bins)) - (np.cumsum(counts) - counts)[bins]
+        pos = self.n_filled[bins] + rank
+        keep = pos < self.n_per_bin
+        self.tx_values[bins[keep], pos[keep]] = tx_dpd[idxs[keep]]
+        self.rx_values[bins[keep], pos[keep]] = rx[idxs[keep]]
+        self.n_filled = np.minimum(self.n_filled + counts, self.n_per_bin)
+
+        rx_values = self._mean_per_bin(np.abs(self.rx_values))
+        tx_values = (self.tx_boundaries[:-1] + self.tx_boundaries[1:]) / 2
+
+        n_per_bin = self.n_filled.copy()
         # Index of first not filled bin, assumes that never all bins are filled
         idx_end = np.argmin(n_per_bin == self.c.ES_n_per_bin)
 
-        phase_diffs_values_lists = self._phase_diff_list_per_bin()
-        phase_diffs_values = _phase_diff_value_per_bin(phase_diffs_values_lists)
+        phase_diffs = np.angle(self.rx_values * self.tx_values.conjugate())
+        phase_diffs_values = self._mean_per_bin(phase_diffs)
 
-        self._plot_data = (tx_values, rx_values, phase_diffs_values, phase_diffs_values_lists)
+        self._plot_data = (tx_values, rx_values, phase_diffs_values, phase_diffs)
 
         tx_values_crop = np.array(tx_values, dtype=np.float32)[:idx_end]
         rx_values_crop = np.array(rx_values, dtype=np.float32)[:idx_end]
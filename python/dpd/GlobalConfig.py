@@ -10,12 +10,13 @@
 import numpy as np
 
 class GlobalConfig:
-    def __init__(self, samplerate: int, plot_location: str):
+    def __init__(self, samplerate: int, plot_location: str, plot: bool = False):
         self.sample_rate = samplerate
         assert self.sample_rate == 8192000, "We only support constants for 8192000 sample rate: {}".format(self.sample_rate)
 
+        # Debugging plots are only written if enabled and if there is a location for them
         self.plot_location = plot_location
-        plot = len(plot_location) > 0
+        plot = plot and len(plot_location) > 0
 
         # DAB frame
         # Time domain
@@ -53,17 +54,16 @@ class GlobalConfig:
         meas_offset = 976  # Offset from center frequency to measure shoulder [kHz]
         meas_width = 100  # Size of frequency delta to measure shoulder [kHz]
         shoulder_offset_edge = np.abs(meas_offset - self.FFT_delta)
-        self.MS_shoulder_left_start = self.FFT_start - shoulder_offset_edge - meas_width / 2
-        self.MS_shoulder_left_end = self.FFT_start - shoulder_offset_edge + meas_width / 2
-        self.MS_shoulder_right_start = self.FFT_end + shoulder_offset_edge - meas_width / 2
-        self.MS_shoulder_right_end = self.FFT_end + shoulder_offset_edge + meas_width / 2
+        self.MS_shoulder_left_start = self.FFT_start - shoulder_offset_edge - meas_width // 2
+        self.MS_shoulder_left_end = self.FFT_start - shoulder_offset_edge + meas_width // 2
+        self.MS_shoulder_right_start = self.FFT_end + shoulder_offset_edge - meas_width // 2
+        self.MS_shoulder_right_end = self.FFT_end + shoulder_offset_edge + meas_width // 2
         self.MS_peak_start = self.FFT_start + 100  # Ignore region near edges
         self.MS_peak_end = self.FFT_end - 100
 
         self.MS_FFT_size = 8192
         self.MS_averaging_size = 4 * self.MS_FFT_size
         self.MS_n_averaging = 40
-        self.MS_n_proc = 4
 
         # Constants for MER
         self.MER_plot = plot
@@ -9,6 +9,7 @@ import datetime
 import os
 import logging
 import numpy as np
+import scipy.fft
 import matplotlib
 matplotlib.use('agg')
 import matplotlib.pyplot as plt
@@ -20,7 +21,7 @@ class MER:
         self.plot = c.MER_plot
 
     def _calc_spectrum(self, tx):
-        fft = np.fft.fftshift(np.fft.fft(tx))
+        fft = scipy.fft.fftshift(scipy.fft.fft(tx, workers=-1))
         return np.delete(fft[self.c.FFT_start:self.c.FFT_end],
                          self.c.FFT_delete)
 
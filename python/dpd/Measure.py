@@ -10,8 +10,11 @@ import socket
 import struct
 import numpy as np
 import dpd.Dab_Util as DU
+from dpd.kernels import abs_median
 import os
 import logging
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 
 class Measure:
     """Collect Measurement from DabMod"""
@@ -22,24 +25,31 @@ class Measure:
         self.sizeof_sample = 8 # complex floats
         self.port = port
         self.num_samples_to_request = num_samples_to_request
+        # Magnitude buffer for the median calculation
+        self._scratch = np.empty(num_samples_to_request, dtype=np.float32)
 
-    def _recv_exact(self, sock : socket.socket, num_bytes : int) -> bytes:
+        # Captures run one at a time, also when started from get_samples_async()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _recv_exact(self, sock : socket.socket, num_bytes : int) -> memoryview:
         """Receive an exact number of bytes from a socket. This is
-        a wrapper around sock.recv() that can return less than the number
-        of requested bytes.
+        a wrapper around sock.recv_into() that can return less than the number
+        of requested bytes. The data is received directly into a single
+        buffer, so that numpy arrays can be created on top of it without copy.
 
         Args:
             sock (socket): Socket to receive data from.
             num_bytes (int): Number of bytes that will be returned.
         """
-        bufs = []
-        while num_bytes > 0:
-            b = sock.recv(num_bytes)
-            if len(b) == 0:
+        buf = memoryview(bytearray(num_bytes))
+        pos = 0
+        while pos < num_bytes:
+            n = sock.recv_into(buf[pos:], num_bytes - pos)
+            if n == 0:
                 break
-            num_bytes -= len(b)
-            bufs.append(b)
-        return b''.join(bufs)
+            pos += n
+        return buf[:pos]
 
     def receive_tcp(self, num_samples_to_request : int):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -59,7 +69,7 @@ class Measure:
         if num_samps > 0:
             logging.debug("Receiving {} TX samples".format(num_samps))
             txframe_bytes = self._recv_exact(s, num_samps * self.sizeof_sample)
-            txframe = np.fromstring(txframe_bytes, dtype=np.complex64)
+            txframe = np.frombuffer(txframe_bytes, dtype=np.complex64)
         else:
             txframe = np.array([], dtype=np.complex64)
 
@@ -70,7 +80,7 @@ class Measure:
         if num_samps > 0:
             logging.debug("Receiving {} RX samples".format(num_samps))
             rxframe_bytes = self._recv_exact(s, num_samps * self.sizeof_sample)
-            rxframe = np.fromstring(rxframe_bytes, dtype=np.complex64)
+            rxframe = np.frombuffer(rxframe_bytes, dtype=np.complex64)
         else:
             rxframe = np.array([], dtype=np.complex64)
 
@@ -90,26 +100,38 @@ class Measure:
 
         return txframe, tx_ts, rxframe, rx_ts
 
+    def _normalize_rx(self, rxframe, rx_median, tx_median):
+        """Scale the RX frame so that its median matches the TX median.
+        Without RX signal the median is zero, in that case the frame is
+        returned unchanged."""
+        if rx_median == 0:
+            logging.warning("RX median is zero, cannot normalize RX signal")
+            return rxframe
+
+        factor = np.float32(tx_median) / np.float32(rx_median)
+        return rxframe * factor
+
     def get_samples_unaligned(self, short=False):
         """Connect to ODR-DabMod, retrieve TX and RX samples, load
         into numpy arrays, and return a tuple
         (txframe, tx_ts, rxframe, rx_ts, rx_median, tx_median)
         """
 
-        n_samps = int(self.num_samples_to_request / 4) if short else self.num_samples_to_request
-        txframe, tx_ts, rxframe, rx_ts = self.receive_tcp(n_samps)
+        with self._lock:
+            n_samps = int(self.num_samples_to_request / 4) if short else self.num_samples_to_request
+            txframe, tx_ts, rxframe, rx_ts = self.receive_tcp(n_samps)
 
-        # Normalize received signal with sent signal
-        rx_median = np.median(np.abs(rxframe))
-        tx_median = np.median(np.abs(txframe))
-        rxframe = rxframe / rx_median * tx_median
+            # Normalize received signal with sent signal
+            rx_median = abs_median(rxframe, self._scratch)
+            tx_median = abs_median(txframe, self._scratch)
+            rxframe = self._normalize_rx(rxframe, rx_median, tx_median)
 
 
-        logging.info(
-            "Measurement done, tx %d %s, rx %d %s" %
-            (len(txframe), txframe.dtype, len(rxframe), rxframe.dtype))
+            logging.info(
+                "Measurement done, tx %d %s, rx %d %s" %
+                (len(txframe), txframe.dtype, len(rxframe), rxframe.dtype))
 
-        return txframe, tx_ts, rxframe, rx_ts, rx_median, tx_median
+            return txframe, tx_ts, rxframe, rx_ts, rx_median, tx_median
 
     def get_samples(self, short=False):
         """Connect to ODR-DabMod, retrieve TX and RX samples, load
@@ -117,23 +139,35 @@ class Measure:
         (txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median)
         """
 
-        n_samps = int(self.num_samples_to_request / 4) if short else self.num_samples_to_request
-        txframe, tx_ts, rxframe, rx_ts = self.receive_tcp(n_samps)
+        with self._lock:
+            n_samps = int(self.num_samples_to_request / 4) if short else self.num_samples_to_request
+            txframe, tx_ts, rxframe, rx_ts = self.receive_tcp(n_samps)
+
+            # Normalize received signal with sent signal
+            rx_median = abs_median(rxframe, self._scratch)
+            tx_median = abs_median(txframe, self._scratch)
+            rxframe = self._normalize_rx(rxframe, rx_median, tx_median)
+
+            du = DU.Dab_Util(self.c, self.samplerate)
+            txframe_aligned, rxframe_aligned = du.subsample_align(txframe, rxframe)
 
-        # Normalize received signal with sent signal
-        rx_median = np.median(np.abs(rxframe))
-        tx_median = np.median(np.abs(txframe))
-        rxframe = rxframe / rx_median * tx_median
+            # The rest of the DPDCE works in single precision
+            txframe_aligned = txframe_aligned.astype(np.complex64, copy=False)
+            rxframe_aligned = rxframe_aligned.astype(np.complex64, copy=False)
 
-        du = DU.Dab_Util(self.c, self.samplerate)
-        txframe_aligned, rxframe_aligned = du.subsample_align(txframe, rxframe)
+            logging.info(
+                "Measurement done, tx %d %s, rx %d %s, tx aligned %d %s, rx aligned %d %s"
+                % (len(txframe), txframe.dtype, len(rxframe), rxframe.dtype,
+                len(txframe_aligned), txframe_aligned.dtype, len(rxframe_aligned), rxframe_aligned.dtype) )
 
-        logging.info(
-            "Measurement done, tx %d %s, rx %d %s, tx aligned %d %s, rx aligned %d %s"
-            % (len(txframe), txframe.dtype, len(rxframe), rxframe.dtype,
-            len(txframe_aligned), txframe_aligned.dtype, len(rxframe_aligned), rxframe_aligned.dtype) )
+            return txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median
 
-        return txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median
+    def get_samples_async(self, short=False):
+        """Start a get_samples() capture in the background, and return
+        a concurrent.futures.Future that will hold its result. This
+        allows the next capture to run while the previous one is being
+        processed."""
+        return self._executor.submit(self.get_samples, short)
 
 # The MIT License (MIT)
 #
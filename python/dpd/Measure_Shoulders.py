@@ -8,8 +8,8 @@
 import datetime
 import os
 import logging
-import multiprocessing
 import numpy as np
+import scipy.fft
 import matplotlib.pyplot as plt
 
 
@@ -60,11 +60,32 @@ def calc_shoulder(fft, c):
     return peak, shoulder
 
 
-def shoulder_from_sig_offset(arg):
-    signal, offset, c = arg
-    fft_db = calc_fft_db(signal, offset, c)
-    peak, shoulder = calc_shoulder(fft_db, c)
-    return peak - shoulder, peak, shoulder
+def shoulders_from_sig_offsets(signal, offsets, c, chunk_size=256):
+    """Calculate peak and shoulder for the FFT windows starting at each
+    of the offsets. The windows are transformed in batches, and only the
+    bins that enter the peak and shoulder averages are converted to dB.
+
+    Returns two arrays (peaks, shoulders)"""
+    windows = np.lib.stride_tricks.sliding_window_view(signal, c.MS_FFT_size)
+
+    def _mean_db(fft, start, end):
+        return np.mean(20 * np.log10(np.abs(fft[:, start:end])), axis=1)
+
+    peaks = np.empty(len(offsets))
+    shoulders = np.empty(len(offsets))
+    for start in range(0, len(offsets), chunk_size):
+        end = min(start + chunk_size, len(offsets))
+        fft = scipy.fft.fftshift(
+                scipy.fft.fft(windows[offsets[start:end]], axis=1, workers=-1),
+                axes=1)
+
+        peaks[start:end] = _mean_db(fft, c.MS_peak_start, c.MS_peak_end)
+        shoulder_left = _mean_db(fft, c.MS_shoulder_left_start, c.MS_shoulder_left_end)
+        shoulder_right = _mean_db(fft, c.MS_shoulder_right_start, c.MS_shoulder_right_end)
+        shoulders[start:end] = (shoulder_left + shoulder_right) / 2
+
+    assert np.all(peaks >= shoulders), (peaks, shoulders)
+    return peaks, shoulders
 
 
 class Measure_Shoulders:
@@ -120,20 +141,12 @@ class Measure_Shoulders:
         off_max = signal.shape[0] - self.c.MS_FFT_size
         offsets = np.linspace(off_min, off_max, num=n_avg, dtype=int)
 
-        args = zip(
-            [signal, ] * offsets.shape[0],
-            offsets,
-            [self.c, ] * offsets.shape[0]
-        )
-
-        pool = multiprocessing.Pool(self.c.MS_n_proc)
-        res = pool.map(shoulder_from_sig_offset, args)
-        shoulders_diff, shoulders, peaks = zip(*res)
+        peaks, shoulders = shoulders_from_sig_offsets(signal, offsets, self.c)
 
         if logging.getLogger().getEffectiveLevel() == logging.DEBUG and self.plot:
             self._plot(signal)
 
-        return np.mean(shoulders_diff), np.mean(shoulders), np.mean(peaks)
+        return np.mean(peaks - shoulders), np.mean(peaks), np.mean(shoulders)
 
 # The MIT License (MIT)
 #
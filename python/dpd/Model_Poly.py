@@ -40,6 +40,10 @@ class Poly:
         self.learning_rate_am = learning_rate_am
         self.learning_rate_pm = learning_rate_pm
 
+        # Buffer for the design matrix of the polynomial fits, reused
+        # across training runs
+        self._fit_matrix = None
+
         self.reset_coefs()
 
     def plot(self, plot_location, title):
@@ -138,8 +142,23 @@ class Poly:
     def _am_poly(self, sig):
         return np.array([sig ** i for i in range(1, 6)]).T
 
+    def _fit_poly_matrix(self, sig, first_power, n_coefs):
+        """Same as np.array([sig ** i for i in range(first_power,
+        first_power + n_coefs)]).T, but built by successive multiplications
+        in a buffer that is kept between calls"""
+        n = sig.shape[0]
+        if (self._fit_matrix is None or self._fit_matrix.shape[0] < n or
+                self._fit_matrix.shape[1] != n_coefs or self._fit_matrix.dtype != sig.dtype):
+            self._fit_matrix = np.empty((max(n, self.c.ES_n_bins), n_coefs), dtype=sig.dtype)
+
+        matrix = self._fit_matrix[:n]
+        matrix[:, 0] = sig ** first_power
+        for k in range(1, n_coefs):
+            np.multiply(matrix[:, k - 1], sig, out=matrix[:, k])
+        return matrix
+
     def _am_fit_poly(self, tx_abs, rx_abs):
-        return np.linalg.lstsq(self._am_poly(rx_abs), tx_abs, rcond=None)[0]
+        return np.linalg.lstsq(self._fit_poly_matrix(rx_abs, 1, 5), tx_abs, rcond=None)[0]
 
     def _am_get_next_coefs(self, tx_dpd, rx_received, coefs_am):
         """Calculate the next AM/AM coefficients using the extracted
@@ -168,7 +187,7 @@ class Poly:
         return tx_dpd, phase_diff
 
     def _pm_fit_poly(self, tx_abs, phase_diff):
-        return np.linalg.lstsq(self._pm_poly(tx_abs), phase_diff, rcond=None)[0]
+        return np.linalg.lstsq(self._fit_poly_matrix(tx_abs, 0, 5), phase_diff, rcond=None)[0]
 
     def _pm_get_next_coefs(self, tx_dpd, phase_diff, coefs_pm):
         """Calculate the next AM/PM coefficients using the extracted
@@ -55,6 +55,11 @@ class Agc:
         # Measure
         txframe, tx_ts, rxframe, rx_ts, rx_median, tx_median = self.measure.get_samples_unaligned(short=False)
 
+        if rx_median == 0:
+            w = "Warning: RX median is zero at RX Gain={}. No RX feedback signal received!".format(self.rxgain)
+            logging.warning(w)
+            return (False, w)
+
         # Estimate Maximum
         rx_peak = self.peak_to_median * rx_median
         correction_factor = 20*np.log10(1/rx_peak)
@@ -23,6 +23,15 @@ def _remove_outliers(x, stds=5):
     return x
 
 
+def _moving_sum(x, n):
+    """Sum over a sliding window of length n, same result as
+    np.correlate(x, np.ones(n), mode='valid') but with a running sum"""
+    cumsum = np.cumsum(x, dtype=np.float64)
+    moving_sum = cumsum[n - 1:].copy()
+    moving_sum[1:] -= cumsum[:-n]
+    return moving_sum
+
+
 def _calc_delta_angle(fft):
     # Introduce invariance against carrier
     angles = np.angle(fft) % (np.pi / 2.)
@@ -56,10 +65,7 @@ class Symbol_align:
         tx_cut_prefix = tx[self.c.T_U:]
 
         tx_product = np.abs(tx_orig - tx_cut_prefix)
-        tx_product_avg = np.correlate(
-            tx_product,
-            np.ones(self.c.T_C),
-            mode='valid')
+        tx_product_avg = _moving_sum(tx_product, self.c.T_C)
         tx_product_avg_min_filt = \
             scipy.ndimage.filters.minimum_filter1d(
                 tx_product_avg,
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# DPD Computation Engine, ahead-of-time compilation of the numeric kernels.
+#
+# http://www.opendigitalradio.org
+# Licence: The MIT License, see notice at the end of this file
+
+"""Compile the kernels from dpd/kernels.py into the _dpd_kernels extension
+module, so that the first DPD iteration does not stall on JIT compilation.
+Requires Numba. Run from the python folder:
+
+    python3 -m dpd._kernels
+"""
+
+import os
+from numba.pycc import CC
+from dpd.kernels import _mse_complex, _abs_median
+
+cc = CC('_dpd_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export('mse_complex', 'f8(c8[::1], c8[::1])')(_mse_complex)
+cc.export('abs_median', 'f8(c8[::1], f4[::1])')(_abs_median)
+
+if __name__ == "__main__":
+    cc.compile()
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Matthias P. Braendli
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# DPD Computation Engine, numeric kernels used in the measurement loop.
+#
+# Numba is optional: the kernels are taken from the ahead-of-time
+# compiled _dpd_kernels module if it was built, are compiled at runtime
+# with Numba if it is installed, and fall back to numpy otherwise.
+#
+# http://www.opendigitalradio.org
+# Licence: The MIT License, see notice at the end of this file
+
+import numpy as np
+
+try:
+    # Kernels compiled ahead of time by dpd/_kernels.py
+    from dpd import _dpd_kernels
+except ImportError:
+    _dpd_kernels = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _mse_complex(tx, rx):
+    """Mean of |tx - rx|^2, computed in a single pass without temporaries"""
+    s = 0.0
+    for i in range(tx.size):
+        d = tx[i] - rx[i]
+        s += d.real * d.real + d.imag * d.imag
+    return s / tx.size
+
+
+def _abs_median(a, scratch):
+    n = a.size
+    for i in range(n):
+        scratch[i] = np.sqrt(a[i].real * a[i].real + a[i].imag * a[i].imag)
+    k = n // 2
+    p = np.partition(scratch[:n], k)
+    if n % 2 == 1:
+        return p[k]
+    return 0.5 * (p[k] + np.max(p[:k]))
+
+
+def _as_complex64(x):
+    return np.ascontiguousarray(x, dtype=np.complex64)
+
+
+if _dpd_kernels is not None:
+    def _mse_complex_kernel(tx, rx):
+        return _dpd_kernels.mse_complex(_as_complex64(tx), _as_complex64(rx))
+
+    def _abs_median_kernel(a, scratch):
+        return np.float32(_dpd_kernels.abs_median(_as_complex64(a), scratch))
+elif njit is not None:
+    _mse_complex_kernel = njit(cache=True, fastmath=True)(_mse_complex)
+    _abs_median_kernel = njit(cache=True)(_abs_median)
+else:
+    _mse_complex_kernel = None
+    _abs_median_kernel = None
+
+
+def _get_scratch(scratch, size, dtype):
+    if scratch is None or scratch.size < size:
+        return np.empty(size, dtype=dtype)
+    return scratch[:size]
+
+
+def mse_scratch(size):
+    """Scratch buffer to pass to mse_complex() for frames of the given
+    size, or None when the compiled kernel is in use and needs none."""
+    if _mse_complex_kernel is not None:
+        return None
+    return np.empty(size, dtype=np.complex64)
+
+
+def mse_complex(tx, rx, scratch=None):
+    """Mean of |tx - rx|^2. Without the compiled kernel, the difference
+    is written into the complex64 buffer scratch, which gets allocated
+    if it is missing or too small."""
+    assert tx.shape == rx.shape, \
+        "tx.shape {}, rx.shape {}".format(tx.shape, rx.shape)
+    if _mse_complex_kernel is not None:
+        return _mse_complex_kernel(tx, rx)
+
+    d = np.subtract(tx, rx, out=_get_scratch(scratch, tx.size, np.complex64))
+    return np.vdot(d, d).real / tx.size
+
+
+def abs_median(a, scratch=None):
+    """Equivalent to np.median(np.abs(a)), using a quickselect instead
+    of a sort. The magnitudes are written into the float32 buffer
+    scratch, which gets allocated if it is missing or too small."""
+    if a.size == 0:
+        return np.float32(np.nan)
+    scratch = _get_scratch(scratch, a.size, np.float32)
+
+    # Always return a numpy scalar like np.median, the compiled kernels
+    # return a Python float that raises on division by zero
+    if _abs_median_kernel is not None:
+        return np.float32(_abs_median_kernel(a, scratch))
+
+    m = np.abs(a, out=scratch)
+    k = a.size // 2
+    m.partition(k)
+    if a.size % 2 == 1:
+        return m[k]
+    return np.float32(0.5 * (m[k] + np.max(m[:k])))
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Matthias P. Braendli
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
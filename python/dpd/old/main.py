@@ -283,11 +283,13 @@ while i < num_iter:
                 tx_shoulder_tuple = MS.average_shoulders(txframe_aligned)
 
                 # Generic logging
-                logging.info(list((name, eval(name)) for name in
+                if logging.getLogger().isEnabledFor(logging.INFO):
+                    variables = locals()
+                    logging.info([(name, variables[name]) for name in
                                   ['i', 'tx_mer', 'tx_shoulder_tuple', 'rx_mer',
                                    'rx_shoulder_tuple', 'mse', 'tx_gain',
                                    'digital_gain', 'rx_gain', 'rx_median',
-                                   'tx_median', 'lr', 'n_meas']))
+                                   'tx_median', 'lr', 'n_meas']])
 
                 # Model specific logging
                 if dpddata[0] == 'poly':
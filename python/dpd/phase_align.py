@@ -60,7 +60,7 @@ def phase_align(sig, ref_sig, plot=False):
         "Compensating phase by {} rad, {} degree. real median {}, imag median {}".format(
         angle, angle*180./np.pi, real_diff, imag_diff
     ))
-    sig = sig * np.exp(1j * -angle)
+    sig = sig * np.complex64(np.exp(1j * -angle))
 
     if logging.getLogger().getEffectiveLevel() == logging.DEBUG and plot:
         plt.subplot(515)
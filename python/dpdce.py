@@ -28,6 +28,8 @@ parser.add_argument('-s', '--status', action="store_true",
         help='Display the currently running DPD settings.')
 parser.add_argument('-r', '--reset', action="store_true",
         help='Reset the DPD settings to the defaults, and set digital gain to 0.01')
+parser.add_argument('--plot', action="store_true",
+        help='Also write the MER and shoulder debugging plots to the plot directory')
 
 cli_args = parser.parse_args()
 allconfig = configparser.ConfigParser()
@@ -35,7 +37,7 @@ allconfig.read(cli_args.config)
 config = allconfig['dpdce']
 
 # removed options:
-# txgain, rxgain, digital_gain, target_median, iterations, lut, enable-txgain-agc, plot, measure
+# txgain, rxgain, digital_gain, target_median, iterations, lut, enable-txgain-agc, measure
 
 control_port = config.getint('control_port')
 dpd_port = config.getint('dpd_port')
@@ -51,31 +53,29 @@ import datetime
 
 save_logs = False
 
+# The same formatter is used by all handlers
+formatter = logging.Formatter('{asctime} - {module} - {levelname} - {message}',
+                              datefmt='%Y-%m-%d %H:%M:%S',
+                              style='{')
+
 # Simple usage scenarios don't need to clutter /tmp
 if save_logs:
     dt = datetime.datetime.utcnow().isoformat()
     logging_path = '/tmp/dpd_{}'.format(dt).replace('.', '_').replace(':', '-')
     print("Logs and plots written to {}".format(logging_path))
     os.makedirs(logging_path)
-    logging.basicConfig(format='%(asctime)s - %(module)s - %(levelname)s - %(message)s',
-                        datefmt='%Y-%m-%d %H:%M:%S',
-                        filename='{}/dpd.log'.format(logging_path),
-                        filemode='w',
-                        level=logging.DEBUG)
+    logfile = logging.FileHandler('{}/dpd.log'.format(logging_path), mode='w')
+    logfile.setFormatter(formatter)
     # also log up to INFO to console
     console = logging.StreamHandler()
     console.setLevel(logging.INFO)
-    # set a format which is simpler for console use
-    formatter = logging.Formatter('%(asctime)s - %(module)s - %(levelname)s - %(message)s')
-    # tell the handler to use this format
     console.setFormatter(formatter)
-    # add the handler to the root logger
-    logging.getLogger('').addHandler(console)
+    logging.basicConfig(handlers=[logfile, console], level=logging.DEBUG)
 else:
     dt = datetime.datetime.utcnow().isoformat()
-    logging.basicConfig(format='%(asctime)s - %(module)s - %(levelname)s - %(message)s',
-                        datefmt='%Y-%m-%d %H:%M:%S',
-                        level=logging.INFO)
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    logging.basicConfig(handlers=[console], level=logging.INFO)
     logging_path = ""
 
 logging.info("DPDCE starting up");
@@ -100,11 +100,12 @@ from dpd.Symbol_align import Symbol_align
 from dpd.GlobalConfig import GlobalConfig
 from dpd.MER import MER
 from dpd.Measure_Shoulders import Measure_Shoulders
+from dpd.kernels import mse_complex, mse_scratch
 
 plot_path = os.path.realpath(plot_directory)
 coef_file = os.path.realpath(config['coef_file'])
 
-c = GlobalConfig(samplerate, plot_path)
+c = GlobalConfig(samplerate, plot_path, cli_args.plot)
 symbol_align = Symbol_align(c)
 mer = MER(c)
 meas_shoulders = Measure_Shoulders(c)
@@ -178,6 +179,11 @@ def clear_pngs(results):
 
 def engine_worker():
     extStat = None
+
+    # Scratch buffer for the numpy fallback of the MSE, reused on every
+    # adapt step. The compiled kernels need none.
+    scratch_c64 = mse_scratch(samps)
+
     while True:
         try:
             cmd = command_queue.get()
@@ -220,21 +226,32 @@ def engine_worker():
                     results['summary'] = ["Reset"]
                     results['modeldata'] = dpddata_to_str(model.get_dpd_data())
                     clear_pngs(results)
-                extStat = None
+                if extStat is not None:
+                    extStat.reset()
             elif cmd == "trigger_run":
                 with lock:
                     results['state'] = 'Capture + Model'
                     results['stateprogress'] = 0
                     n_runs = internal_data['n_runs']
 
+                n_meas = Heuristics.get_n_meas(n_runs)
+                samples = meas.get_samples_async()
                 while True:
                     # Get Samples and check gain
-                    txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median = meas.get_samples()
+                    txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median = samples.result()
 
-                    if extStat is None:
+                    if extStat is None or extStat.n_meas == 0:
                         # At first run, we must decide how to create the bins
                         peak_estimated = tx_median * c.median_to_peak
-                        extStat = ExtractStatistic(c, peak_estimated)
+                        if extStat is None:
+                            extStat = ExtractStatistic(c, peak_estimated)
+                        else:
+                            extStat.reset(peak_estimated)
+
+                    # If more measurements are needed, capture the next one
+                    # while this one is being processed
+                    if extStat.n_meas + 1 < n_meas:
+                        samples = meas.get_samples_async()
 
                     with lock:
                         results['stateprogress'] += 2
@@ -245,7 +262,6 @@ def engine_worker():
                     utctime = datetime.datetime.utcnow()
                     plot_file = "stats_{}.png".format(utctime.strftime("%s"))
                     extStat.plot(os.path.join(plot_path, plot_file), utctime.strftime("%Y-%m-%dT%H%M%S"))
-                    n_meas = Heuristics.get_n_meas(n_runs)
 
                     with lock:
                         results['statplot'] = "dpd/" + plot_file
@@ -293,7 +309,7 @@ def engine_worker():
                         results['stateprogress'] = 90
                         results['summary'] += ["Reset statistics"]
 
-                    extStat = None
+                    extStat.reset()
 
                     with lock:
                         results['state'] = 'Idle'
@@ -313,11 +329,13 @@ def engine_worker():
                 time.sleep(2)
 
                 txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median = meas.get_samples()
+                assert txframe_aligned.dtype == np.complex64, txframe_aligned.dtype
+                assert rxframe_aligned.dtype == np.complex64, rxframe_aligned.dtype
 
                 # Store all settings for pre-distortion, tx and rx
                 utctime = datetime.datetime.utcnow()
                 dump_file = "adapt_{}.pkl".format(utctime.strftime("%s"))
-                adapt.dump(os.path.join(plot_path, dump_file))
+                settings = adapt.dump(os.path.join(plot_path, dump_file))
 
                 with lock:
                     results['adapt_dumps'].append(utctime.strftime("%s"))
@@ -326,10 +344,11 @@ def engine_worker():
                 off = symbol_align.calc_offset(txframe_aligned)
                 tx_mer = mer.calc_mer(txframe_aligned[off:off + c.T_U], debug_name='TX')
                 rx_mer = mer.calc_mer(rxframe_aligned[off:off + c.T_U], debug_name='RX')
-                mse = np.mean(np.abs((txframe_aligned - rxframe_aligned) ** 2))
-                tx_gain = adapt.get_txgain()
-                rx_gain = adapt.get_rxgain()
-                digital_gain = adapt.get_digital_gain()
+                mse = mse_complex(txframe_aligned, rxframe_aligned, scratch_c64)
+                # The dump already fetched the gains from ODR-DabMod
+                tx_gain = settings['txgain']
+                rx_gain = settings['rxgain']
+                digital_gain = settings['digital_gain']
                 rx_shoulder_tuple = meas_shoulders.average_shoulders(rxframe_aligned)
                 tx_shoulder_tuple = meas_shoulders.average_shoulders(txframe_aligned)
 
@@ -373,7 +392,7 @@ def engine_worker():
                             results['state'] = 'Idle'
                             results['stateprogress'] = 100
                             results['summary'] = ["Restored DPD settings from dumpfile {}".format(dump_id),
-                                    "Running with digital gain {}, TX gain {} and RX gain {}".format(d['digital_gain'], d['tx_gain'], d['rx_gain'])]
+                                    "Running with digital gain {}, TX gain {} and RX gain {}".format(d['digital_gain'], d['txgain'], d['rxgain'])]
                             results['modeldata'] = dpddata_to_str(d["dpddata"])
                     except:
                         e = traceback.format_exc()
@@ -443,126 +462,6 @@ finally:
     logging.info('Waiting for DPDCE to stop')
     engine.join()
 
-# Make code below unreachable
-sys.exit(0)
-
-def measure_once():
-    txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median = meas.get_samples()
-
-    print("TX signal median {}".format(np.median(np.abs(txframe_aligned))))
-    print("RX signal median {}".format(rx_median))
-
-    tx, rx, phase_diff, n_per_bin = extStat.extract(txframe_aligned, rxframe_aligned)
-
-    off = symbol_align.calc_offset(txframe_aligned)
-    print("off {}".format(off))
-    tx_mer = mer.calc_mer(txframe_aligned[off:off + c.T_U], debug_name='TX')
-    print("tx_mer {}".format(tx_mer))
-    rx_mer = mer.calc_mer(rxframe_aligned[off:off + c.T_U], debug_name='RX')
-    print("rx_mer {}".format(rx_mer))
-
-    mse = np.mean(np.abs((txframe_aligned - rxframe_aligned) ** 2))
-    print("mse {}".format(mse))
-
-    digital_gain = adapt.get_digital_gain()
-    print("digital_gain {}".format(digital_gain))
-
-    #rx_shoulder_tuple = meas_shoulders.average_shoulders(rxframe_aligned)
-    #tx_shoulder_tuple = meas_shoulders.average_shoulders(txframe_aligned)
-
-state = 'report'
-i = 0
-n_meas = None
-num_iter = 10
-while i < num_iter:
-    try:
-        # Measure
-        if state == 'measure':
-            # Get Samples and check gain
-            txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median = meas.get_samples()
-            # TODO Check TX median
-
-            # Extract usable data from measurement
-            tx, rx, phase_diff, n_per_bin = extStat.extract(txframe_aligned, rxframe_aligned)
-
-            n_meas = Heuristics.get_n_meas(i)
-            if extStat.n_meas >= n_meas:  # Use as many measurements nr of runs
-                state = 'model'
-            else:
-                state = 'measure'
-
-        # Model
-        elif state == 'model':
-            # Calculate new model parameters and delete old measurements
-            if any(x is None for x in [tx, rx, phase_diff]):
-                logging.error("No data to calculate model")
-                state = 'measure'
-                continue
-
-            model.train(tx, rx, phase_diff, lr=Heuristics.get_learning_rate(i))
-            dpddata = model.get_dpd_data()
-            extStat = ExtractStatistic(c)
-            state = 'adapt'
-
-        # Adapt
-        elif state == 'adapt':
-            adapt.set_predistorter(dpddata)
-            state = 'report'
-
-        # Report
-        elif state == 'report':
-            try:
-                txframe_aligned, tx_ts, rxframe_aligned, rx_ts, rx_median, tx_median = meas.get_samples()
-
-                # Store all settings for pre-distortion, tx and rx
-                adapt.dump()
-
-                # Collect logging data
-                off = symbol_align.calc_offset(txframe_aligned)
-                tx_mer = mer.calc_mer(txframe_aligned[off:off + c.T_U], debug_name='TX')
-                rx_mer = mer.calc_mer(rxframe_aligned[off:off + c.T_U], debug_name='RX')
-                mse = np.mean(np.abs((txframe_aligned - rxframe_aligned) ** 2))
-                tx_gain = adapt.get_txgain()
-                rx_gain = adapt.get_rxgain()
-                digital_gain = adapt.get_digital_gain()
-                tx_median = np.median(np.abs(txframe_aligned))
-                rx_shoulder_tuple = meas_shoulders.average_shoulders(rxframe_aligned)
-                tx_shoulder_tuple = meas_shoulders.average_shoulders(txframe_aligned)
-
-                lr = Heuristics.get_learning_rate(i)
-
-                # Generic logging
-                logging.info(list((name, eval(name)) for name in
-                                  ['i', 'tx_mer', 'tx_shoulder_tuple', 'rx_mer',
-                                   'rx_shoulder_tuple', 'mse', 'tx_gain',
-                                   'digital_gain', 'rx_gain', 'rx_median',
-                                   'tx_median', 'lr', 'n_meas']))
-
-                # Model specific logging
-                if dpddata[0] == 'poly':
-                    coefs_am = dpddata[1]
-                    coefs_pm = dpddata[2]
-                    logging.info('It {}: coefs_am {}'.
-                                 format(i, coefs_am))
-                    logging.info('It {}: coefs_pm {}'.
-                                 format(i, coefs_pm))
-                elif dpddata[0] == 'lut':
-                    scalefactor = dpddata[1]
-                    lut = dpddata[2]
-                    logging.info('It {}: LUT scalefactor {}, LUT {}'.
-                                 format(i, scalefactor, lut))
-            except:
-                logging.error('Iteration {}: Report failed.'.format(i))
-                logging.error(traceback.format_exc())
-            i += 1
-            state = 'measure'
-
-    except:
-        logging.error('Iteration {} failed.'.format(i))
-        logging.error(traceback.format_exc())
-        i += 1
-        state = 'measure'
-
 # The MIT License (MIT)
 #
 # Copyright (c) 2017 Andreas Steger
@@ -34,14 +34,12 @@ class ModRemoteControl:
     def _read(self, message_parts: List[str]):
         sock = zmq.Socket(self._ctx, zmq.REQ)
         sock.setsockopt(zmq.LINGER, 0)
+        # Only one request is ever in flight, do not let anything queue up
+        sock.setsockopt(zmq.SNDHWM, 1)
+        sock.setsockopt(zmq.RCVHWM, 1)
         sock.connect("tcp://{}:{}".format(self._host, self._port))
 
-        for i, part in enumerate(message_parts):
-            if i == len(message_parts) - 1:
-                f = 0
-            else:
-                f = zmq.SNDMORE
-            sock.send(part.encode(), flags=f)
+        sock.send_multipart([part.encode() for part in message_parts])
 
         # use poll for timeouts:
         poller = zmq.Poller()